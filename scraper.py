@@ -9,9 +9,15 @@ Implements advanced anti-detection techniques:
 - Mouse/scroll simulation
 """
 
+import os
+import json
 import time
 import random
+import shutil
 import logging
+import tempfile
+from collections import deque
+from pathlib import Path
 from typing import Tuple, Dict
 import numpy as np
 import undetected_chromedriver as uc
@@ -40,17 +46,22 @@ class Config:
     # Delays (base values, will be randomized)
     DELAY_PAGE_LOAD = (20, 35)      # Increased from (15, 25)
     DELAY_SCROLL = (2, 5)
-    DELAY_TYPING = (0.05, 0.15)
+    DELAY_TYPING = (0.05, 0.15)     # Per character
+    TYPING_CHUNK_SIZE = 3           # Characters per send_keys call
     DELAY_MOUSE_MOVE = (0.1, 0.3)
     
     # Session settings
     WARMUP_ENABLED = True
     WARMUP_PAGES = 2                 # Visit 2 pages before scraping
     FINGERPRINT_ROTATION = True
+    PROFILE_SNAPSHOT = True          # Reuse a warmed-up Chrome profile across runs
+    PROFILE_DIR = Path(__file__).parent / 'chrome_profile'  # One snapshot per fingerprint
+    BROWSER_EXIT_TIMEOUT = 15        # Seconds to wait for Chrome to exit after quit()
     
     # Rate limiting
     ADAPTIVE_RATE_LIMITING = True
     MAX_CAPTCHA_RATE = 0.3          # If >30% CAPTCHAs, slow down
+    CAPTCHA_WINDOW = 50             # Recent requests used for the CAPTCHA rate
     
     # Behavior simulation
     SIMULATE_MOUSE = True
@@ -98,6 +109,40 @@ FINGERPRINTS = [
 ]
 
 
+def _driver_template(fingerprint: Dict) -> Dict:
+    """
+    Precompute fingerprint-derived driver settings
+    
+    Args:
+        fingerprint: Browser fingerprint
+    
+    Returns:
+        Dict with '_args', '_prefs' and '_languages' entries
+    """
+    width, height = fingerprint['viewport']
+    return {
+        '_args': (
+            f'--window-size={width},{height}',
+            f'--user-agent={fingerprint["user_agent"]}',
+            '--disable-blink-features=AutomationControlled',
+            '--disable-dev-shm-usage',
+            '--no-sandbox',
+        ),
+        '_prefs': {
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.geolocation': 2,
+            'intl.accept_languages': fingerprint['language'],
+        },
+        '_languages': tuple(fingerprint['language'].split(',')),
+    }
+
+
+# Built once at import instead of on every driver creation
+for _fingerprint in FINGERPRINTS:
+    _fingerprint.update(_driver_template(_fingerprint))
+del _fingerprint
+
+
 def get_random_fingerprint() -> Dict:
     """Select random browser fingerprint"""
     return random.choice(FINGERPRINTS)
@@ -107,6 +152,13 @@ def get_random_fingerprint() -> Dict:
 # HUMAN-LIKE BEHAVIOR
 # =============================================================================
 
+# Pre-drawn standard normals for human_delay (refilled in one call when exhausted)
+_RNG = np.random.default_rng()
+_DELAY_BUF_SIZE = 4096
+_DELAY_BUF = np.empty(_DELAY_BUF_SIZE)
+_DELAY_IDX = [_DELAY_BUF_SIZE]
+
+
 def human_delay(mean: float, std: float = None, min_val: float = None, max_val: float = None) -> float:
     """
     Generate human-like delay using Gaussian distribution
@@ -127,7 +179,13 @@ def human_delay(mean: float, std: float = None, min_val: float = None, max_val:
     if max_val is None:
         max_val = mean * 1.5
     
-    delay = np.random.normal(mean, std)
+    idx = _DELAY_IDX[0]
+    if idx >= _DELAY_BUF_SIZE:
+        _RNG.standard_normal(out=_DELAY_BUF)
+        idx = 0
+    _DELAY_IDX[0] = idx + 1
+    
+    delay = mean + std * float(_DELAY_BUF[idx])
     delay = max(min_val, min(max_val, delay))
     return delay
 
@@ -143,22 +201,17 @@ def scroll_slowly(driver, scroll_pause_time: float = 0.5):
     if not Config.SIMULATE_SCROLL:
         return
     
-    screen_height = driver.execute_script("return window.innerHeight")
-    scroll_height = driver.execute_script("return document.body.scrollHeight")
+    screen_height, scroll_height = driver.execute_script(
+        "return [window.innerHeight, document.body.scrollHeight]"
+    )
     
-    i = 1
-    while True:
-        # Scroll down
-        scroll_to = screen_height * i
+    # Scroll down one screen at a time until the bottom is in view
+    # (targets computed up front instead of re-reading pageYOffset each step)
+    targets = range(screen_height, max(scroll_height, screen_height + 1), screen_height)
+    pauses = (scroll_pause_time + _RNG.uniform(-0.2, 0.3, len(targets))).tolist()
+    for scroll_to, pause in zip(targets, pauses):
         driver.execute_script(f"window.scrollTo(0, {scroll_to});")
-        time.sleep(scroll_pause_time + random.uniform(-0.2, 0.3))
-        
-        i += 1
-        
-        # Check if at bottom
-        scroll_pos = driver.execute_script("return window.pageYOffset + window.innerHeight")
-        if scroll_pos >= scroll_height:
-            break
+        time.sleep(pause)
     
     # Scroll back up a bit (humans do this)
     if random.random() < 0.3:  # 30% chance
@@ -184,15 +237,16 @@ def random_mouse_movement(driver, element=None):
         # Move to element with random offset
         size = element.size
         width, height = size['width'], size['height']
-        offset_x = random.randint(-width//3, width//3)
-        offset_y = random.randint(-height//3, height//3)
+        offset_x, offset_y = _RNG.integers(
+            [-width//3, -height//3], [width//3, height//3], endpoint=True
+        ).tolist()
         actions.move_to_element_with_offset(element, offset_x, offset_y)
     else:
         # Random movement
-        viewport_width = driver.execute_script("return window.innerWidth")
-        viewport_height = driver.execute_script("return window.innerHeight")
-        x = random.randint(0, viewport_width)
-        y = random.randint(0, viewport_height)
+        viewport_width, viewport_height = driver.execute_script(
+            "return [window.innerWidth, window.innerHeight]"
+        )
+        x, y = _RNG.integers(0, [viewport_width, viewport_height], endpoint=True).tolist()
         actions.move_by_offset(x, y)
     
     actions.pause(random.uniform(*Config.DELAY_MOUSE_MOVE))
@@ -225,13 +279,20 @@ def human_type(element, text: str):
         element: Input element
         text: Text to type
     """
-    for char in text:
-        element.send_keys(char)
-        # Vary typing speed
-        time.sleep(random.uniform(*Config.DELAY_TYPING))
+    chunk_size = Config.TYPING_CHUNK_SIZE
+    # Draw all per-key delays and per-burst typo rolls up front
+    key_delays = _RNG.uniform(*Config.DELAY_TYPING, len(text))
+    typo_rolls = _RNG.random(-(-len(text) // chunk_size)).tolist()
+    
+    for start, typo_roll in zip(range(0, len(text), chunk_size), typo_rolls):
+        # Send a short burst per round-trip instead of one key at a time
+        chunk = text[start:start + chunk_size]
+        element.send_keys(chunk)
+        # Vary typing speed (same total pause as typing each key)
+        time.sleep(float(key_delays[start:start + chunk_size].sum()))
         
-        # Random typo (2% chance)
-        if random.random() < 0.02:
+        # Random typo (2% chance per character)
+        if typo_roll < 0.02 * len(chunk):
             # Press wrong key
             wrong_char = random.choice('qwertyuiop')
             element.send_keys(wrong_char)
@@ -255,8 +316,8 @@ def simulate_reading_delay():
 
 class AdaptiveRateLimiter:
     """
-    Adjusts delays based on CAPTCHA frequency
-    If CAPTCHAs increase → slow down
+    Adjusts delays based on recent CAPTCHA frequency
+    If CAPTCHAs increase → slow down; once they pass → speed back up
     """
     
     def __init__(self, logger):
@@ -264,6 +325,13 @@ class AdaptiveRateLimiter:
         self.base_delay = (Config.DELAY_PAGE_LOAD[0] + Config.DELAY_PAGE_LOAD[1]) / 2
         self.captcha_count = 0
         self.request_count = 0
+        # 1 per request that hit a CAPTCHA, 0 otherwise (last CAPTCHA_WINDOW requests)
+        self._outcomes = deque(maxlen=Config.CAPTCHA_WINDOW)
+    
+    @property
+    def captcha_rate(self) -> float:
+        """CAPTCHA rate over the recent request window"""
+        return sum(self._outcomes) / max(len(self._outcomes), 1)
         
     def wait(self):
         """Wait with adaptive delay"""
@@ -272,7 +340,7 @@ class AdaptiveRateLimiter:
             return
         
         # Calculate current CAPTCHA rate
-        captcha_rate = self.captcha_count / max(self.request_count, 1)
+        captcha_rate = self.captcha_rate
         
         # Adjust delay based on CAPTCHA rate
         if captcha_rate > 0.5:  # >50% CAPTCHAs
@@ -291,25 +359,49 @@ class AdaptiveRateLimiter:
         time.sleep(delay)
         
         self.request_count += 1
+        self._outcomes.append(0)
     
     def report_captcha(self):
-        """Report CAPTCHA encountered"""
+        """Report CAPTCHA encountered (charged to the latest request)"""
         self.captcha_count += 1
-        captcha_rate = self.captcha_count / max(self.request_count, 1)
-        self.logger.warning(f"CAPTCHA #{self.captcha_count} (rate: {captcha_rate:.1%})")
+        # wait() appends a 0 per request, so a trailing 1 means this request
+        # was already charged; repeat reports only bump the lifetime count
+        if not self._outcomes:
+            self._outcomes.append(1)  # CAPTCHA before the first wait()
+        elif not self._outcomes[-1]:
+            self._outcomes[-1] = 1
+        self.logger.warning(f"CAPTCHA #{self.captcha_count} (rate: {self.captcha_rate:.1%})")
 
 
 # =============================================================================
 # BROWSER INITIALIZATION
 # =============================================================================
 
-def create_stealth_driver(fingerprint: Dict = None, logger = None) -> uc.Chrome:
+# Marker written into a profile snapshot once it is complete
+PROFILE_MARKER = 'snapshot_ok'
+
+# Lock files and caches are not carried between sessions: cookies and local
+# storage hold the trust, while the HTTP/code caches can reach hundreds of MB
+# and the profile is copied twice per run (seed + snapshot)
+_PROFILE_IGNORE = shutil.ignore_patterns(
+    PROFILE_MARKER, 'Singleton*', 'lockfile', 'Crashpad',
+    'Cache', 'Code Cache', 'CacheStorage', 'ScriptCache',
+    'GPUCache', 'ShaderCache', 'GrShaderCache',
+)
+
+
+def create_stealth_driver(fingerprint: Dict = None, logger = None, profile_dir: Path = None) -> uc.Chrome:
     """
     Create undetected Chrome driver with stealth patches
     
     Args:
         fingerprint: Browser fingerprint to use
         logger: Logger instance
+        profile_dir: Root of the profile snapshots (see snapshot_profile). Each
+            fingerprint has its own snapshot, since trust cookies are tied to
+            the fingerprint they were earned with. The session runs on a private
+            copy; driver.profile_snapshot_dir is that fingerprint's snapshot and
+            driver.profile_seeded tells whether it existed.
     
     Returns:
         Configured Chrome driver
@@ -320,41 +412,49 @@ def create_stealth_driver(fingerprint: Dict = None, logger = None) -> uc.Chrome:
     if logger:
         logger.info(f"Creating driver with fingerprint: {fingerprint['name']}")
     
-    # Chrome options
-    options = uc.ChromeOptions()
-    
-    # Set viewport
-    width, height = fingerprint['viewport']
-    options.add_argument(f'--window-size={width},{height}')
+    # Custom fingerprints passed in by callers lack the precomputed template
+    if '_args' not in fingerprint:
+        fingerprint = {**fingerprint, **_driver_template(fingerprint)}
     
-    # Set user agent
-    options.add_argument(f'--user-agent={fingerprint["user_agent"]}')
-    
-    # Additional options
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--no-sandbox')
+    # Chrome options (viewport, user agent, automation flags)
+    options = uc.ChromeOptions()
+    for arg in fingerprint['_args']:
+        options.add_argument(arg)
     
-    # Set preferences
-    prefs = {
-        'profile.default_content_setting_values.notifications': 2,
-        'profile.default_content_setting_values.geolocation': 2,
-        'intl.accept_languages': fingerprint['language'],
-    }
-    options.add_experimental_option('prefs', prefs)
+    # Set preferences (shared template; only read when the driver starts)
+    options.add_experimental_option('prefs', fingerprint['_prefs'])
     
     # Exclude automation switches
     options.add_experimental_option('excludeSwitches', ['enable-automation'])
     options.add_experimental_option('useAutomationExtension', False)
     
-    # Create driver
-    driver = uc.Chrome(options=options)
+    # Create driver (on a private copy of the warm profile, if one exists)
+    seeded = False
+    snapshot_dir = None
+    if profile_dir is not None:
+        snapshot_dir = Path(profile_dir) / fingerprint['name']
+        session_dir = tempfile.mkdtemp(prefix='chrome_profile_')
+        try:
+            if (snapshot_dir / PROFILE_MARKER).exists():
+                shutil.copytree(snapshot_dir, session_dir, ignore=_PROFILE_IGNORE, dirs_exist_ok=True)
+                seeded = True
+                if logger:
+                    logger.info(f"Seeded profile from snapshot: {snapshot_dir}")
+            driver = uc.Chrome(options=options, user_data_dir=session_dir)
+        except Exception:
+            # No driver owns the session copy yet, so nothing else will remove it
+            shutil.rmtree(session_dir, ignore_errors=True)
+            raise
+    else:
+        driver = uc.Chrome(options=options)
+    driver.profile_seeded = seeded
+    driver.profile_snapshot_dir = snapshot_dir
     
     # Apply selenium-stealth (if available)
     if STEALTH_AVAILABLE:
         stealth(
             driver,
-            languages=fingerprint['language'].split(','),
+            languages=fingerprint['_languages'],
             vendor="Google Inc.",
             platform=fingerprint['platform'],
             webgl_vendor="Intel Inc.",
@@ -381,11 +481,124 @@ def create_stealth_driver(fingerprint: Dict = None, logger = None) -> uc.Chrome:
     return driver
 
 
+def _process_alive(pid: int) -> bool:
+    """Check whether a process is still running (reaping it if it is our child)"""
+    if os.name == 'nt':
+        # os.kill() would terminate the process on Windows; query a handle instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x00100000, False, pid)  # SYNCHRONIZE
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == 0x102  # WAIT_TIMEOUT
+        finally:
+            kernel32.CloseHandle(handle)
+    
+    try:
+        # Chrome is our child when launched via subprocess; an exited child
+        # stays a zombie (and looks alive to kill(pid, 0)) until reaped
+        return os.waitpid(pid, os.WNOHANG) == (0, 0)
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def wait_for_browser_exit(driver, timeout: float = None) -> bool:
+    """
+    Wait for the Chrome process to exit after driver.quit()
+    undetected_chromedriver's quit() only sends SIGTERM and returns, while
+    Chrome is still flushing cookies/storage into its profile
+    
+    Args:
+        driver: Chrome driver (already quit)
+        timeout: Seconds to wait (default: Config.BROWSER_EXIT_TIMEOUT)
+    
+    Returns:
+        True if the browser exited within the timeout
+    """
+    if timeout is None:
+        timeout = Config.BROWSER_EXIT_TIMEOUT
+    
+    pid = getattr(driver, 'browser_pid', None)
+    if not pid:
+        return True
+    
+    deadline = time.monotonic() + timeout
+    while _process_alive(pid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def snapshot_profile(session_dir, profile_dir: Path, logger = None):
+    """
+    Save a session's Chrome profile as the warm snapshot for later runs
+    Call only once Chrome has exited (see wait_for_browser_exit), so the
+    cookie DB and local storage are complete on disk
+    
+    Args:
+        session_dir: Profile directory the driver ran on (driver.user_data_dir)
+        profile_dir: Snapshot location (driver.profile_snapshot_dir)
+        logger: Logger instance
+    """
+    profile_dir = Path(profile_dir)
+    profile_dir.parent.mkdir(parents=True, exist_ok=True)
+    
+    # Private staging/stale dirs, so concurrent sessions with the same
+    # fingerprint never share (or swap in) each other's half-finished copy
+    staging = Path(tempfile.mkdtemp(dir=profile_dir.parent, prefix=profile_dir.name + '.'))
+    stale = None
+    
+    try:
+        shutil.copytree(session_dir, staging, ignore=_PROFILE_IGNORE, dirs_exist_ok=True)
+        (staging / PROFILE_MARKER).touch()
+        
+        # Swap in the new snapshot so readers never see a partial copy
+        if profile_dir.exists():
+            stale = Path(tempfile.mkdtemp(dir=profile_dir.parent, prefix=profile_dir.name + '.old.'))
+            profile_dir.rename(stale / 'profile')
+        staging.rename(profile_dir)
+        
+        if logger:
+            logger.info(f"Saved warm profile snapshot: {profile_dir}")
+    except Exception as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        if logger:
+            logger.warning(f"Could not save profile snapshot: {e}")
+    finally:
+        if stale is not None:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def discard_profile_snapshot(profile_dir: Path, logger = None):
+    """
+    Drop a snapshot whose profile got flagged, so the next run warms up from scratch
+    
+    Args:
+        profile_dir: Snapshot location (driver.profile_snapshot_dir)
+        logger: Logger instance
+    """
+    profile_dir = Path(profile_dir)
+    # Removing the marker first invalidates the snapshot even if rmtree stops short
+    (profile_dir / PROFILE_MARKER).unlink(missing_ok=True)
+    shutil.rmtree(profile_dir, ignore_errors=True)
+    if logger:
+        logger.warning(f"Discarded flagged profile snapshot: {profile_dir}")
+
+
 # =============================================================================
 # SESSION WARMUP
 # =============================================================================
 
-def warmup_session(driver, logger):
+def warmup_session(driver, logger) -> bool:
     """
     Build trust score before scraping
     Visits non-target pages to appear human
@@ -393,9 +606,16 @@ def warmup_session(driver, logger):
     Args:
         driver: Selenium WebDriver
         logger: Logger instance
+    
+    Returns:
+        True if a warmup was run and completed
     """
     if not Config.WARMUP_ENABLED:
-        return
+        return False
+    
+    if getattr(driver, 'profile_seeded', False):
+        logger.info("Using warm profile snapshot. Skipping warmup.")
+        return False
     
     logger.info("🔥 Warming up session (building trust score)...")
     
@@ -430,15 +650,45 @@ def warmup_session(driver, logger):
             simulate_reading_delay()
         
         logger.info("✅ Session warmed up. Trust score improved.")
+        return True
         
     except Exception as e:
         logger.error(f"Error during warmup: {e}")
+        return False
 
 
 # =============================================================================
 # CAPTCHA DETECTION
 # =============================================================================
 
+# PerimeterX CAPTCHA indicators
+CAPTCHA_INDICATORS = (
+    "Press & Hold",
+    "distil_r_captcha",
+    "_Incapsula_Resource",
+    "perimeterx",
+    "px-captcha",
+)
+
+# Specific CAPTCHA elements
+CAPTCHA_SELECTORS = (
+    "iframe[src*='captcha']",
+    "div[class*='captcha']",
+    "div[id*='captcha']",
+)
+
+# One selector union, so the DOM is queried once for all elements
+_CAPTCHA_CSS = ','.join(CAPTCHA_SELECTORS)
+
+# Evaluated browser-side so only a boolean crosses the driver connection,
+# instead of serializing the whole page source
+_CAPTCHA_JS = f"""
+const html = document.documentElement.outerHTML.toLowerCase();
+if ({json.dumps([i.lower() for i in CAPTCHA_INDICATORS])}.some(i => html.includes(i))) return true;
+return document.querySelector({json.dumps(_CAPTCHA_CSS)}) !== null;
+"""
+
+
 def is_captcha_present(driver) -> bool:
     """
     Check if CAPTCHA page is shown
@@ -450,33 +700,7 @@ def is_captcha_present(driver) -> bool:
         True if CAPTCHA detected
     """
     try:
-        # PerimeterX CAPTCHA indicators
-        indicators = [
-            "Press & Hold",
-            "distil_r_captcha",
-            "_Incapsula_Resource",
-            "perimeterx",
-            "px-captcha",
-        ]
-        
-        page_source = driver.page_source.lower()
-        
-        for indicator in indicators:
-            if indicator.lower() in page_source:
-                return True
-        
-        # Check for specific CAPTCHA elements
-        captcha_selectors = [
-            "iframe[src*='captcha']",
-            "div[class*='captcha']",
-            "div[id*='captcha']",
-        ]
-        
-        for selector in captcha_selectors:
-            if driver.find_elements(By.CSS_SELECTOR, selector):
-                return True
-        
-        return False
+        return bool(driver.execute_script(_CAPTCHA_JS))
         
     except Exception:
         return False
@@ -505,11 +729,14 @@ def main():
     
     # Create driver with random fingerprint
     fingerprint = get_random_fingerprint()
-    driver = create_stealth_driver(fingerprint, logger)
+    profile_dir = Config.PROFILE_DIR if Config.PROFILE_SNAPSHOT else None
+    driver = create_stealth_driver(fingerprint, logger, profile_dir)
+    warmed_up = False
+    completed = False
     
     try:
-        # Warmup session
-        warmup_session(driver, logger)
+        # Warmup session (skipped when seeded from a warm snapshot)
+        warmed_up = warmup_session(driver, logger)
         
         # Now ready to scrape
         logger.info("\n🎯 Starting scraping...")
@@ -559,11 +786,33 @@ def main():
             except Exception as e:
                 logger.error(f"Error during search: {e}")
         
+        completed = True
+        
     finally:
         logger.info("\nClosing browser...")
         time.sleep(random.uniform(2, 5))  # Don't close immediately
         driver.quit()
         
+        if profile_dir is not None:
+            # The session copy is only safe to read or delete once Chrome has exited
+            browser_exited = wait_for_browser_exit(driver)
+            
+            # Only persist a profile that got through the whole run unflagged
+            # (not one from a run aborted by an error or Ctrl-C)
+            if rate_limiter.captcha_count:
+                if driver.profile_seeded:
+                    discard_profile_snapshot(driver.profile_snapshot_dir, logger)
+            elif completed and warmed_up:
+                if browser_exited:
+                    snapshot_profile(driver.user_data_dir, driver.profile_snapshot_dir, logger)
+                else:
+                    logger.warning("Chrome did not exit in time. Skipping profile snapshot.")
+            
+            if browser_exited:
+                shutil.rmtree(driver.user_data_dir, ignore_errors=True)
+            else:
+                logger.warning(f"Leaving session profile in place: {driver.user_data_dir}")
+        
     logger.info("\n✅ Done!")
 
 